@@ -28,16 +28,19 @@ Options
   ${BASE_PATH}/modules/${MODULE_NAME}/Kconfig.
 """
 
-from distutils.command.build import build
+from concurrent.futures import ProcessPoolExecutor
+import gzip
+import hashlib
 from itertools import chain
 import json
-from operator import mod
+import multiprocessing
 import os
 from pathlib import Path
 import re
+import shutil
 import sys
 from tempfile import TemporaryDirectory
-from typing import Any, Dict, Iterable, List, Optional, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 
 from docutils import nodes
 from sphinx.addnodes import pending_xref
@@ -51,41 +54,107 @@ from sphinx.util import progress_message
 from sphinx.util.docutils import SphinxDirective
 from sphinx.util.nodes import make_refnode
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-__version__ = "0.1.0"
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+__version__ = "0.2.0"
 
 
 RESOURCES_DIR = Path(__file__).parent / "static"
 ZEPHYR_BASE = Path(__file__).parents[4]
 
-SCRIPTS = ZEPHYR_BASE / "scripts"
-sys.path.insert(0, str(SCRIPTS))
+# imported on first use, see _import_kconfiglib()
+zephyr_module = None
+kconfiglib = None
+
+
+def _import_kconfiglib() -> None:
+    """Import ``zephyr_module`` and ``kconfiglib`` on first use.
+
+    The imports are deferred so that merely loading the extension (e.g. for
+    Kconfig domain support in builds that never generate the database) does
+    not pay for them.
+    """
+
+    global zephyr_module, kconfiglib
+
+    if kconfiglib:
+        return
+
+    scripts = ZEPHYR_BASE / "scripts"
+    sys.path.insert(0, str(scripts))
+    sys.path.insert(0, str(scripts / "kconfig"))
+
+    import zephyr_module
+    import kconfiglib
+
+    _SC_FMT[kconfiglib.Symbol] = _fmt_sym
+    _SC_FMT[kconfiglib.Choice] = _fmt_choice
 
-KCONFIGLIB = SCRIPTS / "kconfig"
-sys.path.insert(0, str(KCONFIGLIB))
 
-import zephyr_module
-import kconfiglib
+def kconfig_cache_key(app: Sphinx) -> str:
+    """Compute a key identifying the current Kconfig tree state.
 
+    The key is derived from the path, size and modification time of every file
+    that can influence the generated database, so that a cached database can
+    be reused as long as none of them changed. Parsing the module list here is
+    cheap compared to the Kconfig parse it allows skipping.
+    """
 
-def kconfig_load(app: Sphinx) -> Tuple[kconfiglib.Kconfig, Dict[str, str]]:
+    _import_kconfiglib()
+
+    hasher = hashlib.blake2b()
+
+    # a new extension version may change the database format, so never
+    # re-use a database cached by an older one
+    hasher.update(__version__.encode())
+
+    paths = [ZEPHYR_BASE / "west.yml"]
+    paths += ZEPHYR_BASE.rglob("Kconfig*")
+
+    # module metadata and Kconfig files live outside ZEPHYR_BASE but are
+    # sourced into the tree, so they need to invalidate the cache as well
+    for module in zephyr_module.parse_modules(ZEPHYR_BASE):
+        project = Path(module.project)
+        paths.append(project / "zephyr" / "module.yml")
+        paths.append(project / "zephyr" / "module.yaml")
+        paths += project.rglob("Kconfig*")
+
+    for ext_path in app.config.kconfig_ext_paths:
+        paths += Path(ext_path).glob("modules/*/Kconfig")
+
+    for path in sorted(paths):
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        hasher.update(f"{path}:{stat.st_mtime_ns}:{stat.st_size}".encode())
+
+    return hasher.hexdigest()
+
+
+def kconfig_load(app: Sphinx) -> Tuple["kconfiglib.Kconfig", Dict[str, str]]:
     """Load Kconfig"""
+    _import_kconfiglib()
+
     with TemporaryDirectory() as td:
         modules = zephyr_module.parse_modules(ZEPHYR_BASE)
 
         # generate Kconfig.modules file
-        kconfig = ""
-        for module in modules:
-            kconfig += zephyr_module.process_kconfig(module.project, module.meta)
-
         with open(Path(td) / "Kconfig.modules", "w") as f:
-            f.write(kconfig)
+            for module in modules:
+                f.write(zephyr_module.process_kconfig(module.project, module.meta))
 
         # generate dummy Kconfig.dts file
-        kconfig = ""
-
-        with open(Path(td) / "Kconfig.dts", "w") as f:
-            f.write(kconfig)
+        (Path(td) / "Kconfig.dts").touch()
 
         # base environment
         os.environ["ZEPHYR_BASE"] = str(ZEPHYR_BASE)
@@ -121,10 +190,14 @@ def kconfig_load(app: Sphinx) -> Tuple[kconfiglib.Kconfig, Dict[str, str]]:
         return kconfiglib.Kconfig(ZEPHYR_BASE / "Kconfig"), module_paths
 
 
+# computed once at import time, the search box markup is fully static
+_KCONFIG_SEARCH_HTML = '<div id="__kconfig-search"></div>'
+
+
 class KconfigSearchNode(nodes.Element):
     @staticmethod
     def html():
-        return '<div id="__kconfig-search"></div>'
+        return _KCONFIG_SEARCH_HTML
 
 
 def kconfig_search_visit_html(self, node: nodes.Node) -> None:
@@ -153,10 +226,13 @@ class KconfigSearch(SphinxDirective):
 
         self.env.temp_data["kconfig_search_inserted"] = True
 
+        kconfig_build_resources(self.env.app)
+
         # register all options to the domain at this point, so that they all
         # resolve to the page where the kconfig:search directive is inserted
         domain = self.env.get_domain("kconfig")
-        unique = set({option["name"] for option in self.env.kconfig_db})
+        domain.add_search_page(self.env.docname)
+        unique = set(kconfig_option_names(self.env.app))
         for option in unique:
             domain.add_option(option)
 
@@ -187,14 +263,23 @@ class KconfigDomain(Domain):
     object_types = {"option": ObjType("option", "option")}
     roles = {"option": XRefRole()}
     directives = {"search": KconfigSearch}
-    initial_data: Dict[str, Any] = {"options": []}
+    initial_data: Dict[str, Any] = {
+        "options": [],
+        "options_by_name": {},
+        "search_docnames": [],
+    }
+    # bump whenever initial_data changes shape, so that a pickled environment
+    # from an older extension version is discarded instead of crashing us
+    data_version = 1
 
     def get_objects(self) -> Iterable[Tuple[str, str, str, str, str, int]]:
-        for obj in self.data["options"]:
-            yield obj
+        return iter(self.data["options"])
 
     def merge_domaindata(self, docnames: List[str], otherdata: Dict) -> None:
         self.data["options"] += otherdata["options"]
+        self.data["options_by_name"].update(otherdata["options_by_name"])
+        for docname in otherdata["search_docnames"]:
+            self.add_search_page(docname)
 
     def resolve_xref(
         self,
@@ -206,14 +291,10 @@ class KconfigDomain(Domain):
         node: pending_xref,
         contnode: nodes.Element,
     ) -> Optional[nodes.Element]:
-        match = [
-            (docname, anchor)
-            for name, _, _, docname, anchor, _ in self.get_objects()
-            if name == target
-        ]
+        match = self.data["options_by_name"].get(target)
 
         if match:
-            todocname, anchor = match[0]
+            todocname, anchor = match
 
             return make_refnode(
                 builder, fromdocname, todocname, anchor, contnode, anchor
@@ -227,170 +308,596 @@ class KconfigDomain(Domain):
         self.data["options"].append(
             (option, option, "option", self.env.docname, option, -1)
         )
+        self.data["options_by_name"][option] = (self.env.docname, option)
+
+    def add_search_page(self, docname: str) -> None:
+        """Remember a page containing the ``kconfig:search`` directive.
+
+        The recorded pages are forced out of date when the database needs to
+        be regenerated, see kconfig_get_outdated().
+        """
+
+        if docname not in self.data["search_docnames"]:
+            self.data["search_docnames"].append(docname)
+
+
+def _fmt_sym(sym):
+    if sym.nodes:
+        return f'<a href="#CONFIG_{sym.name}">CONFIG_{sym.name}</a>'
+
+    return kconfiglib.standard_sc_expr_str(sym)
+
+
+def _fmt_choice(choice):
+    if not choice.name:
+        return "&ltchoice&gt"
+
+    return f'&ltchoice <a href="#CONFIG_{choice.name}">CONFIG_{choice.name}</a>&gt'
+
+
+# sc_fmt is the hot callback of the expression stringifier, dispatch on the
+# exact type instead of probing with isinstance on every call. populated in
+# _import_kconfiglib().
+_SC_FMT: Dict[Any, Any] = {}
 
 
 def sc_fmt(sc):
-    if isinstance(sc, kconfiglib.Symbol):
-        if sc.nodes:
-            return f'<a href="#CONFIG_{sc.name}">CONFIG_{sc.name}</a>'
-    elif isinstance(sc, kconfiglib.Choice):
-        if not sc.name:
-            return "&ltchoice&gt"
-        return f'&ltchoice <a href="#CONFIG_{sc.name}">CONFIG_{sc.name}</a>&gt'
+    return _SC_FMT.get(type(sc), kconfiglib.standard_sc_expr_str)(sc)
 
-    return kconfiglib.standard_sc_expr_str(sc)
 
+# expression AST nodes are immutable within a single Kconfig instance, so the
+# formatted strings can be memoized by object identity. cleared once the
+# database has been generated.
+_expr_str_cache: Dict[int, str] = {}
 
-def kconfig_build_resources(app: Sphinx) -> None:
-    """Build the Kconfig database and install HTML resources."""
+
+def _expr_str(expr) -> str:
+    """Memoized version of ``kconfiglib.expr_str(expr, sc_fmt)``."""
+    fmt = _expr_str_cache.get(id(expr))
+    if fmt is None:
+        fmt = kconfiglib.expr_str(expr, sc_fmt)
+        _expr_str_cache[id(expr)] = fmt
+
+    return fmt
+
+
+# menu paths are shared by all nodes below the same parent, so they are
+# memoized by parent node identity. cleared together with _expr_str_cache.
+_menupath_cache: Dict[int, str] = {}
+
+
+def _menupath(node) -> str:
+    """Build the menu path of a node, memoized per parent chain."""
+
+    # walk up until the top node or an already-known ancestor is found
+    pending = list()
+    iternode = node.parent
+    menupath = "(Top)"
+    while iternode is not node.kconfig.top_node:
+        cached = _menupath_cache.get(id(iternode))
+        if cached is not None:
+            menupath = cached
+            break
+        pending.append(iternode)
+        iternode = iternode.parent
+
+    # then fill the cache for every newly visited ancestor on the way down
+    for iternode in reversed(pending):
+        if iternode.prompt:
+            title = iternode.prompt[0]
+        else:
+            title = kconfiglib.standard_sc_expr_str(iternode.item)
+        menupath = f"{menupath} > {title}"
+        _menupath_cache[id(iternode)] = menupath
+
+    return menupath
+
+
+def _dump_entry(entry: Any) -> bytes:
+    """Serialize part of the database to compact JSON."""
+    if orjson:
+        return orjson.dumps(entry)
+
+    return json.dumps(
+        entry, separators=(",", ":"), ensure_ascii=False, check_circular=False
+    ).encode("utf-8")
+
+
+# column order of the pooled database rows, must be kept in sync with the
+# decoder in static/kconfig.mjs
+_DB_COLUMNS = [
+    "name",
+    "prompt",
+    "type",
+    "help",
+    "dependencies",
+    "defaults",
+    "alt_defaults",
+    "selects",
+    "selected_by",
+    "implies",
+    "implied_by",
+    "ranges",
+    "choices",
+    "filename",
+    "linenr",
+    "menupath",
+]
+
+
+def _pool_entry(entry: Dict[str, Any], pool: Dict[str, int]) -> List[Any]:
+    """Convert an entry into its string-pooled row representation.
+
+    Many fields repeat heavily across entries (types, filenames, menu paths,
+    formatted expressions), so every string is stored once in a shared pool
+    and the rows only carry integer indices into it.
+    """
+
+    def intern(value: str) -> int:
+        index = pool.get(value)
+        if index is None:
+            index = len(pool)
+            pool[value] = index
+        return index
+
+    row = list()
+    for column in _DB_COLUMNS:
+        value = entry[column]
+        if column == "linenr":
+            row.append(value)
+        elif column == "alt_defaults":
+            row.append([[intern(fmt), intern(filename)] for fmt, filename in value])
+        elif isinstance(value, list):
+            row.append([intern(item) for item in value])
+        elif value is None:
+            row.append(None)
+        else:
+            row.append(intern(value))
+
+    return row
+
+
+# per-symbol batch handed to each worker process. smaller batches lose more
+# time merging results than they gain in parallelism.
+_CHUNK_SIZE = 200
+
+# state inherited by fork()ed worker processes, see _parallel_sym_entries()
+_worker_kconfig = None
+_worker_module_name_by_path: Dict[str, str] = {}
+_worker_module_path_re = None
+
+
+def _sym_entries_chunk(names: List[str]) -> List[Dict[str, Any]]:
+    """Build the entries for a chunk of symbol names (worker side)."""
+
+    syms = _worker_kconfig.syms
+    return [
+        entry
+        for name in names
+        for entry in _sym_entries(
+            syms[name], _worker_module_name_by_path, _worker_module_path_re
+        )
+    ]
+
+
+def _parallel_sym_entries(
+    jobs: int, kconfig, symbols, module_name_by_path, module_path_re
+) -> Iterable[Dict[str, Any]]:
+    """Build symbol entries on a pool of worker processes.
+
+    Symbols cannot be pickled, so the workers are fork()ed and inherit the
+    parsed Kconfig tree, receiving only chunks of symbol names. Results are
+    yielded in submission order, keeping the database deterministic.
+    """
+
+    global _worker_kconfig, _worker_module_name_by_path, _worker_module_path_re
+    _worker_kconfig = kconfig
+    _worker_module_name_by_path = module_name_by_path
+    _worker_module_path_re = module_path_re
+
+    names = [sym.name for sym in symbols]
+    chunks = [
+        names[i : i + _CHUNK_SIZE] for i in range(0, len(names), _CHUNK_SIZE)
+    ]
+
+    ctx = multiprocessing.get_context("fork")
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=ctx) as executor:
+        for entries in executor.map(_sym_entries_chunk, chunks):
+            yield from entries
+
+
+def _fmt_if(fmt: str, cond, y) -> str:
+    """Append the ``if COND`` suffix to a formatted property value."""
+
+    if cond is y:
+        return fmt
+
+    return f"{fmt} if {_expr_str(cond)}"
+
+
+def _rev_dep_syms(expr) -> List[str]:
+    """List the symbols that select/imply another one.
+
+    All reverse dependencies are ORed together, and conditionals (e.g.
+    select/imply A if B) turns into A && B. So we first split by OR to include
+    all entries, and we split each one by AND to just take the first entry.
+    """
+
+    syms = list()
+    for select in kconfiglib.split_expr(expr, kconfiglib.OR):
+        sym = kconfiglib.split_expr(select, kconfiglib.AND)[0]
+        syms.append(f"CONFIG_{sym.name}")
+
+    return syms
+
+
+def _sym_entries(sym, module_name_by_path, module_path_re) -> List[Dict[str, Any]]:
+    """Build the database entries for a single symbol."""
+
+    selected_by = list()
+    if sym.rev_dep != sym.kconfig.n:
+        selected_by = _rev_dep_syms(sym.rev_dep)
+
+    implied_by = list()
+    if sym.weak_rev_dep != sym.kconfig.n:
+        implied_by = _rev_dep_syms(sym.weak_rev_dep)
+
+    return _sc_entries(
+        sym, selected_by, implied_by, list(), module_name_by_path, module_path_re
+    )
+
+
+def _choice_entries(
+    choice, module_name_by_path, module_path_re
+) -> List[Dict[str, Any]]:
+    """Build the database entries for a single choice."""
+
+    choices = [_expr_str(sym) for sym in choice.syms]
+
+    return _sc_entries(
+        choice, list(), list(), choices, module_name_by_path, module_path_re
+    )
+
+
+def _sc_entries(
+    sc, selected_by, implied_by, choices, module_name_by_path, module_path_re
+) -> List[Dict[str, Any]]:
+    """Build the database entries for the nodes of a symbol or choice."""
+
+    entries = list()
+    y = sc.kconfig.y
+
+    # store alternative defaults (from defconfig files). most symbols have no
+    # defconfig entries at all, so filter them out first and skip the whole
+    # block when there are none
+    alt_defaults = list()
+    defconfig_nodes = [node for node in sc.nodes if "defconfig" in node.filename]
+    for node in defconfig_nodes:
+        filename = node.filename
+        for value, cond in node.orig_defaults:
+            alt_defaults.append([_fmt_if(_expr_str(value), cond, y), filename])
+
+    # only process nodes with prompt or help
+    nodes = [node for node in sc.nodes if node.prompt or node.help]
+
+    inserted_paths = set()
+    for node in nodes:
+        # avoid duplicate symbols by forcing unique paths. this can
+        # happen due to dependencies on 0, a trick used by some modules
+        path = f"{node.filename}:{node.linenr}"
+        if path in inserted_paths:
+            continue
+        inserted_paths.add(path)
+
+        dependencies = None
+        if node.dep is not y:
+            dependencies = _expr_str(node.dep)
+
+        defaults = [
+            _fmt_if(_expr_str(value), cond, y) for value, cond in node.orig_defaults
+        ]
+
+        selects = [
+            _fmt_if(_expr_str(value), cond, y) for value, cond in node.orig_selects
+        ]
+
+        implies = [
+            _fmt_if(_expr_str(value), cond, y) for value, cond in node.orig_implies
+        ]
+
+        ranges = [
+            _fmt_if(f"[{_expr_str(min)}, {_expr_str(max)}]", cond, y)
+            for min, max, cond in node.orig_ranges
+        ]
+
+        menupath = _menupath(node)
+
+        filename = node.filename
+        if module_path_re:
+            match = module_path_re.match(filename)
+            if match:
+                name = module_name_by_path[match.group(1)]
+                filename = f"<module:{name}>{filename[match.end():]}"
+
+        entries.append(
+            {
+                "name": f"CONFIG_{sc.name}",
+                "prompt": node.prompt[0] if node.prompt else None,
+                "type": kconfiglib.TYPE_TO_STR[sc.type],
+                "help": node.help,
+                "dependencies": dependencies,
+                "defaults": defaults,
+                "alt_defaults": alt_defaults,
+                "selects": selects,
+                "selected_by": selected_by,
+                "implies": implies,
+                "implied_by": implied_by,
+                "ranges": ranges,
+                "choices": choices,
+                "filename": filename,
+                "linenr": node.linenr,
+                "menupath": menupath,
+            }
+        )
+
+    return entries
+
+
+def _write_msgpack_db(kconfig_db_file: Path) -> None:
+    """Write a MessagePack variant of the database next to the JSON one.
+
+    MessagePack parses several times faster than JSON text in Python, so
+    other extensions or scripts consuming the database can prefer the
+    kconfig.msgpack file when the msgpack package is available.
+    """
+
+    if not msgpack:
+        return
+
+    db = json.loads(kconfig_db_file.read_text())
+    with open(kconfig_db_file.with_suffix(".msgpack"), "wb") as f:
+        msgpack.pack(db, f, use_bin_type=True)
+
+
+def _write_gzip_db(kconfig_db_file: Path) -> Path:
+    """Write a pre-compressed copy of the database for the browser.
+
+    The search page loader fetches kconfig.json.gz first when the browser
+    can inflate it, cutting the transfer size considerably.
+    """
+
+    gz_file = kconfig_db_file.with_suffix(".json.gz")
+    with open(kconfig_db_file, "rb") as src:
+        with gzip.open(gz_file, "wb", compresslevel=9) as dst:
+            shutil.copyfileobj(src, dst)
+
+    return gz_file
+
+
+def _restore_cached_db(app: Sphinx, kconfig_db_file: Path, cache_key: str) -> bool:
+    """Restore a cached database into the output directory if still valid."""
+
+    cached_db_file = Path(app.doctreedir) / "kconfig.json"
+    cache_key_file = Path(app.doctreedir) / "kconfig.cachekey"
+
+    if not (
+        cached_db_file.exists()
+        and cache_key_file.exists()
+        and cache_key_file.read_text() == cache_key
+    ):
+        return False
+
+    with progress_message("Re-using cached Kconfig database..."):
+        shutil.copyfile(cached_db_file, kconfig_db_file)
+        _write_msgpack_db(kconfig_db_file)
+        _write_gzip_db(kconfig_db_file)
+
+    app._kconfig_db_path = kconfig_db_file  # type: ignore
+
+    return True
+
+
+def kconfig_builder_inited(app: Sphinx) -> None:
+    """Prepare the database output files and resources.
+
+    This must run in the main Sphinx process: on parallel builds the database
+    itself may be generated in a forked worker, whose configuration changes
+    are discarded, so everything the builder picks up from the configuration
+    (html_extra_path/html_static_path) is registered here. A still-valid
+    cached database is also restored here, deferring only the expensive
+    Kconfig tree parse to kconfig_build_resources().
+    """
 
     if not app.config.kconfig_generate_db:
         return
 
+    outdir = Path(app.outdir) / "kconfig"
+    outdir.mkdir(exist_ok=True)
+
+    kconfig_db_file = outdir / "kconfig.json"
+
+    app.config.html_extra_path.append(kconfig_db_file.as_posix())
+    app.config.html_extra_path.append(
+        kconfig_db_file.with_suffix(".json.gz").as_posix()
+    )
+    app.config.html_static_path.append(RESOURCES_DIR.as_posix())
+
+    # checking the cache key is cheap compared to the Kconfig tree parse, so
+    # do it eagerly: it decides below whether the cached database can be
+    # re-used and, in kconfig_get_outdated(), whether search pages must be
+    # re-read to regenerate it
+    cache_key = kconfig_cache_key(app)
+    app._kconfig_cache_key = cache_key  # type: ignore
+
+    _restore_cached_db(app, kconfig_db_file, cache_key)
+
+
+def kconfig_get_outdated(
+    app: Sphinx,
+    env: BuildEnvironment,
+    added: Set[str],
+    changed: Set[str],
+    removed: Set[str],
+) -> List[str]:
+    """Force search pages to be re-read when the database is out of date.
+
+    Without this, an incremental build where only Kconfig files changed would
+    consider every document up to date, never run the search directive and
+    silently ship the stale database.
+    """
+
+    if not app.config.kconfig_generate_db or hasattr(app, "_kconfig_db_path"):
+        return []
+
+    domain = env.get_domain("kconfig")
+    return [
+        docname
+        for docname in domain.data["search_docnames"]
+        if docname in env.found_docs
+    ]
+
+
+def kconfig_option_names(app: Sphinx) -> List[str]:
+    """Option names found in the generated database.
+
+    The names are kept on the application rather than in the build
+    environment so that the database is never pickled into the environment
+    cache, and are loaded back lazily from the database file when it was
+    re-used from a previous build.
+    """
+
+    names = getattr(app, "_kconfig_db_names", None)
+    if names is None:
+        db = json.loads(app._kconfig_db_path.read_text())
+        strings = db["strings"]
+        name_column = db["columns"].index("name")
+        names = [strings[row[name_column]] for row in db["rows"]]
+        app._kconfig_db_names = names  # type: ignore
+
+    return names
+
+
+def kconfig_build_resources(app: Sphinx) -> None:
+    """Build the Kconfig database.
+
+    The database is built on demand, the first time a ``kconfig:search``
+    directive is actually encountered, so that builds without one skip the
+    full Kconfig tree parse entirely. Subsequent calls are no-ops. The HTML
+    resource registration happens in kconfig_builder_inited() instead, as on
+    parallel builds this may run in a forked worker whose configuration
+    changes are discarded.
+    """
+
+    if not app.config.kconfig_generate_db or hasattr(app, "_kconfig_db_path"):
+        return
+
+    outdir = Path(app.outdir) / "kconfig"
+    outdir.mkdir(exist_ok=True)
+
+    kconfig_db_file = outdir / "kconfig.json"
+
+    cache_key = getattr(app, "_kconfig_cache_key", None)
+    if cache_key is None:
+        cache_key = kconfig_cache_key(app)
+        app._kconfig_cache_key = cache_key  # type: ignore
+
+    cached_db_file = Path(app.doctreedir) / "kconfig.json"
+    cache_key_file = Path(app.doctreedir) / "kconfig.cachekey"
+
+    # another process of this build (e.g. a parallel reader, while this is
+    # the writer) may have generated and cached the database already
+    if _restore_cached_db(app, kconfig_db_file, cache_key):
+        return
+
     with progress_message("Building Kconfig database..."):
         kconfig, module_paths = kconfig_load(app)
-        db = list()
-
-        for sc in sorted(
-            chain(kconfig.unique_defined_syms, kconfig.unique_choices),
-            key=lambda sc: sc.name if sc.name else "",
-        ):
-            # skip nameless symbols
-            if not sc.name:
-                continue
+        db_names = list()
+
+        # precompile a single anchored matcher for module paths (longest path
+        # first) so that each node costs one regex match instead of a linear
+        # scan over all modules
+        module_name_by_path = {path: name for name, path in module_paths.items()}
+        module_path_re = None
+        if module_name_by_path:
+            module_path_re = re.compile(
+                "^("
+                + "|".join(
+                    re.escape(path)
+                    for path in sorted(module_name_by_path, key=len, reverse=True)
+                )
+                + ")"
+            )
+
+        string_pool: Dict[str, int] = {}
+
+        with open(kconfig_db_file, "wb") as f:
+            f.write(b'{"columns":')
+            f.write(_dump_entry(_DB_COLUMNS))
+            f.write(b',"rows":[')
+            first = True
+
+            symbols = sorted(kconfig.unique_defined_syms, key=lambda sym: sym.name)
 
-            # store alternative defaults (from defconfig files)
-            alt_defaults = list()
-            for node in sc.nodes:
-                if "defconfig" not in node.filename:
-                    continue
-
-                for value, cond in node.orig_defaults:
-                    fmt = kconfiglib.expr_str(value, sc_fmt)
-                    if cond is not sc.kconfig.y:
-                        fmt += f" if {kconfiglib.expr_str(cond, sc_fmt)}"
-                    alt_defaults.append([fmt, node.filename])
-
-            # build list of symbols that select/imply the current one
-            # note: all reverse dependencies are ORed together, and conditionals
-            # (e.g. select/imply A if B) turns into A && B. So we first split
-            # by OR to include all entries, and we split each one by AND to just
-            # take the first entry.
-            selected_by = list()
-            if isinstance(sc, kconfiglib.Symbol) and sc.rev_dep != sc.kconfig.n:
-                for select in kconfiglib.split_expr(sc.rev_dep, kconfiglib.OR):
-                    sym = kconfiglib.split_expr(select, kconfiglib.AND)[0]
-                    selected_by.append(f"CONFIG_{sym.name}")
-
-            implied_by = list()
-            if isinstance(sc, kconfiglib.Symbol) and sc.weak_rev_dep != sc.kconfig.n:
-                for select in kconfiglib.split_expr(sc.weak_rev_dep, kconfiglib.OR):
-                    sym = kconfiglib.split_expr(select, kconfiglib.AND)[0]
-                    implied_by.append(f"CONFIG_{sym.name}")
-
-            # only process nodes with prompt or help
-            nodes = [node for node in sc.nodes if node.prompt or node.help]
-
-            inserted_paths = list()
-            for node in nodes:
-                # avoid duplicate symbols by forcing unique paths. this can
-                # happen due to dependencies on 0, a trick used by some modules
-                path = f"{node.filename}:{node.linenr}"
-                if path in inserted_paths:
-                    continue
-                inserted_paths.append(path)
-
-                dependencies = None
-                if node.dep is not sc.kconfig.y:
-                    dependencies = kconfiglib.expr_str(node.dep, sc_fmt)
-
-                defaults = list()
-                for value, cond in node.orig_defaults:
-                    fmt = kconfiglib.expr_str(value, sc_fmt)
-                    if cond is not sc.kconfig.y:
-                        fmt += f" if {kconfiglib.expr_str(cond, sc_fmt)}"
-                    defaults.append(fmt)
-
-                selects = list()
-                for value, cond in node.orig_selects:
-                    fmt = kconfiglib.expr_str(value, sc_fmt)
-                    if cond is not sc.kconfig.y:
-                        fmt += f" if {kconfiglib.expr_str(cond, sc_fmt)}"
-                    selects.append(fmt)
-
-                implies = list()
-                for value, cond in node.orig_implies:
-                    fmt = kconfiglib.expr_str(value, sc_fmt)
-                    if cond is not sc.kconfig.y:
-                        fmt += f" if {kconfiglib.expr_str(cond, sc_fmt)}"
-                    implies.append(fmt)
-
-                ranges = list()
-                for min, max, cond in node.orig_ranges:
-                    fmt = (
-                        f"[{kconfiglib.expr_str(min, sc_fmt)}, "
-                        f"{kconfiglib.expr_str(max, sc_fmt)}]"
+            # shard the per-symbol work across processes on parallel builds
+            # ("sphinx-build -j"). fork() is required as the workers need to
+            # inherit the parsed Kconfig tree.
+            if app.parallel > 1 and "fork" in multiprocessing.get_all_start_methods():
+                sym_entries = _parallel_sym_entries(
+                    app.parallel, kconfig, symbols, module_name_by_path, module_path_re
+                )
+            else:
+                sym_entries = (
+                    entry
+                    for sym in symbols
+                    for entry in _sym_entries(
+                        sym, module_name_by_path, module_path_re
                     )
-                    if cond is not sc.kconfig.y:
-                        fmt += f" if {kconfiglib.expr_str(cond, sc_fmt)}"
-                    ranges.append(fmt)
-
-                choices = list()
-                if isinstance(sc, kconfiglib.Choice):
-                    for sym in sc.syms:
-                        choices.append(kconfiglib.expr_str(sym, sc_fmt))
-
-                menupath = ""
-                iternode = node
-                while iternode.parent is not iternode.kconfig.top_node:
-                    iternode = iternode.parent
-                    if iternode.prompt:
-                        title = iternode.prompt[0]
-                    else:
-                        title = kconfiglib.standard_sc_expr_str(iternode.item)
-                    menupath = f" > {title}" + menupath
-
-                menupath = "(Top)" + menupath
-
-                filename = node.filename
-                for name, path in module_paths.items():
-                    if node.filename.startswith(path):
-                        filename = node.filename.replace(path, f"<module:{name}>")
-                        break
-
-                db.append(
-                    {
-                        "name": f"CONFIG_{sc.name}",
-                        "prompt": node.prompt[0] if node.prompt else None,
-                        "type": kconfiglib.TYPE_TO_STR[sc.type],
-                        "help": node.help,
-                        "dependencies": dependencies,
-                        "defaults": defaults,
-                        "alt_defaults": alt_defaults,
-                        "selects": selects,
-                        "selected_by": selected_by,
-                        "implies": implies,
-                        "implied_by": implied_by,
-                        "ranges": ranges,
-                        "choices": choices,
-                        "filename": filename,
-                        "linenr": node.linenr,
-                        "menupath": menupath,
-                    }
                 )
 
-        app.env.kconfig_db = db  # type: ignore
+            # symbols and choices are handled in two specialized passes so
+            # that the per-entry work needs no isinstance dispatch. the
+            # database lists all symbols first, then all named choices.
+            entries = chain(
+                sym_entries,
+                (
+                    entry
+                    for choice in sorted(
+                        kconfig.unique_choices,
+                        key=lambda choice: choice.name if choice.name else "",
+                    )
+                    # skip nameless choices
+                    if choice.name
+                    for entry in _choice_entries(
+                        choice, module_name_by_path, module_path_re
+                    )
+                ),
+            )
 
-        outdir = Path(app.outdir) / "kconfig"
-        outdir.mkdir(exist_ok=True)
+            for entry in entries:
+                # stream the entry to disk so that the complete database
+                # is never held in memory
+                if not first:
+                    f.write(b",")
+                first = False
+                f.write(_dump_entry(_pool_entry(entry, string_pool)))
 
-        kconfig_db_file = outdir / "kconfig.json"
+                db_names.append(entry["name"])
 
-        with open(kconfig_db_file, "w") as f:
-            json.dump(db, f)
+            f.write(b'],"strings":')
+            f.write(_dump_entry(list(string_pool)))
+            f.write(b"}")
 
-    app.config.html_extra_path.append(kconfig_db_file.as_posix())
-    app.config.html_static_path.append(RESOURCES_DIR.as_posix())
+        _expr_str_cache.clear()
+        _menupath_cache.clear()
+
+        app._kconfig_db_path = kconfig_db_file  # type: ignore
+        app._kconfig_db_names = db_names  # type: ignore
+
+        _write_msgpack_db(kconfig_db_file)
+        _write_gzip_db(kconfig_db_file)
+
+        shutil.copyfile(kconfig_db_file, cached_db_file)
+        cache_key_file.write_text(cache_key)
 
 
 def kconfig_install(
@@ -411,6 +918,10 @@ def kconfig_install(
     visitor = _FindKconfigSearchDirectiveVisitor(doctree)
     doctree.walk(visitor)
     if visitor.found_kconfig_search_directive:
+        # covers pages restored from a cached doctree, where the search
+        # directive did not run in this build
+        kconfig_build_resources(app)
+
         app.add_css_file("kconfig.css")
         app.add_js_file("kconfig.mjs", type="module")
 
@@ -427,7 +938,8 @@ def setup(app: Sphinx):
 
     app.add_domain(KconfigDomain)
 
-    app.connect("builder-inited", kconfig_build_resources)
+    app.connect("builder-inited", kconfig_builder_inited)
+    app.connect("env-get-outdated", kconfig_get_outdated)
     app.connect("html-page-context", kconfig_install)
 
     return {
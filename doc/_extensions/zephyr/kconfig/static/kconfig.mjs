@@ -4,6 +4,7 @@
  */
 
 const DB_FILE = 'kconfig.json';
+const DB_FILE_GZ = 'kconfig.json.gz';
 const RESULTS_PER_PAGE_OPTIONS = [10, 25, 50];
 
 /* search state */
@@ -337,6 +338,61 @@ function doSearch() {
     });
 }
 
+/**
+ * Decode the string-pooled database layout into entry objects.
+ * @param {Object} data Pooled database ("columns"/"rows"/"strings").
+ * @returns Database entries.
+ */
+function decodeDb(data) {
+    const columns = data.columns;
+    const strings = data.strings;
+
+    return data.rows.map(row => {
+        const entry = {};
+        columns.forEach((column, index) => {
+            const value = row[index];
+            if (column === 'linenr') {
+                entry[column] = value;
+            } else if (column === 'alt_defaults') {
+                entry[column] = value.map(
+                    pair => [strings[pair[0]], strings[pair[1]]]
+                );
+            } else if (Array.isArray(value)) {
+                entry[column] = value.map(item => strings[item]);
+            } else if (value === null) {
+                entry[column] = null;
+            } else {
+                entry[column] = strings[value];
+            }
+        });
+        return entry;
+    });
+}
+
+/**
+ * Load the Kconfig database, preferring the pre-compressed variant when the
+ * browser can inflate it.
+ * @returns Database entries.
+ */
+async function loadDb() {
+    if (typeof DecompressionStream !== 'undefined') {
+        try {
+            const response = await fetch(DB_FILE_GZ);
+            if (response.ok) {
+                const stream = response.body.pipeThrough(
+                    new DecompressionStream('gzip')
+                );
+                return decodeDb(await new Response(stream).json());
+            }
+        } catch (error) {
+            /* fall back to the plain JSON database */
+        }
+    }
+
+    const response = await fetch(DB_FILE);
+    return decodeDb(await response.json());
+}
+
 /** Do a search from URL hash */
 function doSearchFromURL() {
     const rawOption = window.location.hash.substring(1);
@@ -454,8 +510,7 @@ function setupKconfigSearch() {
     /* load database */
     showProgress('Loading database...');
 
-    fetch(DB_FILE)
-        .then(response => response.json())
+    loadDb()
         .then(json => {
             db = json;
 